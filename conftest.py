@@ -0,0 +1,2 @@
+# Root conftest: makes pytest put the repository root on sys.path, so the tests
+# can import `src` with a plain `pytest` run (the pages import it the same way).
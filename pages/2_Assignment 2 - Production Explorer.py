@@ -1,16 +1,20 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from src.data_loader import load_elhub_api_data
+from src.data_loader import (
+    load_elhub_areas,
+    load_elhub_groups,
+    load_elhub_group_totals,
+    load_elhub_hourly,
+)
 
 st.title("Production explorer")
 
-# Load Elhub data (2021) from MongoDB via cached helper
-df = load_elhub_api_data()
+# Elhub data (2021) is queried per selection from the local Parquet copy
 YEAR = 2021
 
 # Available price areas
-AREAS = sorted(df["pricearea"].dropna().unique().tolist())
+AREAS = load_elhub_areas()
 
 # Make sure we have a shared price area in session state
 if "pricearea" not in st.session_state:
@@ -34,24 +38,12 @@ left_col, right_col = st.columns(2)
 with left_col:
     st.subheader("Share by group (2021)")
 
-    # Filter to selected area and year
-    df_area_2021 = df[
-        (df["pricearea"] == area)
-        & (df["starttime"].dt.year == YEAR)
-    ]
+    # Aggregate energy per production group for the selected area and year
+    pie_data = load_elhub_group_totals(area, YEAR)
 
-    if df_area_2021.empty:
+    if pie_data.empty:
         st.warning("No data found for 2021.")
     else:
-        # Aggregate energy per production group
-        pie_data = (
-            df_area_2021
-            .groupby("productiongroup", as_index=False)["quantitykwh"]
-            .sum()
-            .rename(columns={"quantitykwh": "kwh"})
-            .sort_values("kwh", ascending=False)
-        )
-
         # Simple pie chart of share by group
         fig_pie = px.pie(
             pie_data,
@@ -74,12 +66,7 @@ with right_col:
     )
 
     # All production groups that exist in this price area
-    groups_in_area = sorted(
-        df.loc[df["pricearea"] == area, "productiongroup"]
-        .dropna()
-        .unique()
-        .tolist()
-    )
+    groups_in_area = load_elhub_groups(area)
 
     # Pills for selecting one or more production groups
     selected_groups = st.pills(
@@ -89,22 +76,8 @@ with right_col:
         default=groups_in_area,
     )
 
-    # Filter by area, year, month and chosen groups
-    mask = (
-        (df["pricearea"] == area)
-        & (df["starttime"].dt.year == YEAR)
-        & (df["starttime"].dt.month == month)
-    )
-    if selected_groups:
-        mask &= df["productiongroup"].isin(selected_groups)
-
     # Aggregate hourly kWh per group (one line per group)
-    df_hourly = (
-        df[mask]
-        .groupby(["starttime", "productiongroup"], as_index=False)["quantitykwh"]
-        .sum()
-        .rename(columns={"quantitykwh": "kwh"})
-    )
+    df_hourly = load_elhub_hourly(area, YEAR, month, selected_groups)
 
     if df_hourly.empty:
         st.info("No hourly data for this selection.")
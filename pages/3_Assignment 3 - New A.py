@@ -3,7 +3,8 @@ import matplotlib.pyplot as plt
 from statsmodels.tsa.seasonal import STL
 import pandas as pd
 
-from src.data_loader import load_elhub_api_data
+from src.data_loader import load_elhub_areas, load_elhub_groups, load_elhub_series
+from src.shared_compute import shared, figure_to_png, data_fingerprint
 
 st.title("Assignment 3 – STL and spectrogram")
 
@@ -86,12 +87,10 @@ def plot_spectrogram_elhub(
 
     return fig, ax
 
-# ---- Load Elhub data and use price area from page 2 ----
-
-df = load_elhub_api_data()
+# ---- Use price area from page 2 and query Elhub data per selection ----
 
 # Find available price areas
-areas = sorted(df["pricearea"].dropna().unique().tolist())
+areas = load_elhub_areas()
 
 # Use selection from "Production explorer" if available
 current_area = st.session_state.get("pricearea", areas[0])
@@ -101,12 +100,7 @@ if current_area not in areas:
 st.write(f"Current price area: **{current_area}**")
 
 # All production groups in this price area
-groups = sorted(
-    df.loc[df["pricearea"] == current_area, "productiongroup"]
-      .dropna()
-      .unique()
-      .tolist()
-)
+groups = load_elhub_groups(current_area)
 
 # ---- Tabs for STL and Spectrogram ----
 tab_stl, tab_spec = st.tabs(["STL", "Spectrogram"])
@@ -122,7 +116,11 @@ with tab_stl:
     trend = st.number_input("Trend smoother", min_value=3, value=365, step=1)
     robust = st.checkbox("Robust", value=True)
 
-    try:
+    # Only the rows for this area and group are read from Parquet
+    df = load_elhub_series(current_area, group)
+
+    # STL is the expensive step: share it across sessions with identical settings
+    def render_stl():
         fig_stl, result = plot_stl_elhub(
             df,
             area=current_area,
@@ -132,7 +130,14 @@ with tab_stl:
             trend=trend,
             robust=robust,
         )
-        st.pyplot(fig_stl, use_container_width=False)
+        return figure_to_png(fig_stl)
+
+    try:
+        png_stl = shared.call(
+            ("stl", current_area, group, period, seasonal, trend, robust, data_fingerprint(df)),
+            render_stl,
+        )
+        st.image(png_stl)
     except ValueError as e:
         st.warning(str(e))
 
@@ -157,9 +162,11 @@ with tab_spec:
         step=0.1,
     )
 
+    df_spec = load_elhub_series(current_area, group_spec)
+
     try:
         fig_spec, ax_spec = plot_spectrogram_elhub(
-            df,
+            df_spec,
             area=current_area,
             group=group_spec,
             window_length=window_length,
@@ -168,3 +175,7 @@ with tab_spec:
         st.pyplot(fig_spec)
     except ValueError as e:
         st.warning(str(e))
+
+# ---- Shared computation cache (all sessions on this server) ----
+with st.expander("Shared computation cache"):
+    st.json(shared.stats())
@@ -1,18 +1,9 @@
 import streamlit as st
 import pandas as pd
-from src.data_loader import load_open_meteo_api
+from src.data_loader import AREA_COORDS, load_open_meteo_api
 
 st.title("Data table")
 
-# Map price areas to city coordinates
-AREA_COORDS = {
-    "NO1": (59.91390, 10.75220),  # Oslo
-    "NO2": (58.14670, 7.99560),   # Kristiansand
-    "NO3": (63.43050, 10.39510),  # Trondheim
-    "NO4": (69.64920, 18.95600),  # Tromsø
-    "NO5": (60.39299, 5.32415),   # Bergen
-}
-
 # Use shared selection from Production Explorer, fallback to NO1
 pricearea = st.session_state.get("pricearea", "NO1")
 lat, lon = AREA_COORDS[pricearea]
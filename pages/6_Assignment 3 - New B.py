@@ -1,11 +1,10 @@
 import streamlit as st
-import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
-from scipy.fft import dct, idct
-from sklearn.neighbors import LocalOutlierFactor
 
-from src.data_loader import load_open_meteo_api
+from src.analytics import spc_temperature, lof_precipitation
+from src.data_loader import AREA_COORDS, load_open_meteo_api
+from src.shared_compute import shared, figure_to_png, data_fingerprint
 
 st.title("Assignment 3 – Outliers and anomalies (SPC & LOF)")
 
@@ -20,51 +19,23 @@ def plot_temperature_with_spc(
     trend_keep_fraction=0.02,  # how much of the lowest DCT frequencies to keep for trend
     sigma_threshold=3.0        # sigma threshold for SPC limits
 ):
-    # Ensure chronological order and extract arrays
-    df = df.sort_values(time_col).reset_index(drop=True)
-    timestamps = pd.to_datetime(df[time_col])
-    temp = df[temp_col].to_numpy(dtype=float)
-
-    # Simple NaN handling: interpolate missing values
-    if np.isnan(temp).any():
-        temp = pd.Series(temp).interpolate(limit_direction="both").to_numpy()
-
-    n_samples = len(temp)
-
-    # --------- DCT: separate low-frequency (trend) and high-frequency (variations) ----------
-    coeffs = dct(temp, type=2, norm="ortho")
-
-    # Number of lowest frequencies to keep for the smooth seasonal trend
-    keep = max(1, int(trend_keep_fraction * n_samples))
-
-    trend_coeffs = np.zeros_like(coeffs)
-    trend_coeffs[:keep] = coeffs[:keep]
-    seasonal_trend = idct(trend_coeffs, type=2, norm="ortho")
-
-    # Seasonally Adjusted Temperature Variations (SATV)
-    satv = temp - seasonal_trend
-
-    # --------- Robust SPC statistics on SATV ----------
-    satv_center = np.median(satv)
-    satv_mad = np.median(np.abs(satv - satv_center))
-    # Convert MAD to a normal-consistent sigma; fall back to std if MAD==0
-    robust_sigma = 1.4826 * satv_mad if satv_mad > 0 else np.std(satv)
-
-    satv_lower = satv_center - sigma_threshold * robust_sigma
-    satv_upper = satv_center + sigma_threshold * robust_sigma
-
-    # Map SPC limits back to temperature scale by adding the trend
-    lower_limit = seasonal_trend + satv_lower
-    upper_limit = seasonal_trend + satv_upper
-
-    # Outliers are points where SATV is outside limits
-    is_outlier = (satv < satv_lower) | (satv > satv_upper)
+    # DCT trend + SPC limits (shared with the data API)
+    points, summary = spc_temperature(
+        df,
+        time_col=time_col,
+        temp_col=temp_col,
+        trend_keep_fraction=trend_keep_fraction,
+        sigma_threshold=sigma_threshold,
+    )
+    timestamps = points[time_col]
+    temp = points[temp_col]
+    is_outlier = points["is_outlier"]
 
     # --------- Plot ----------
     fig, ax = plt.subplots(figsize=(10, 4))
     ax.plot(timestamps, temp, linewidth=0.9, label="Temperature")
-    ax.plot(timestamps, lower_limit, linestyle="--", linewidth=0.9, label="SPC lower")
-    ax.plot(timestamps, upper_limit, linestyle="--", linewidth=0.9, label="SPC upper")
+    ax.plot(timestamps, points["spc_lower"], linestyle="--", linewidth=0.9, label="SPC lower")
+    ax.plot(timestamps, points["spc_upper"], linestyle="--", linewidth=0.9, label="SPC upper")
     ax.scatter(timestamps[is_outlier], temp[is_outlier], s=12, color="red", label="Outliers")
 
     ax.set_xlabel("Time")
@@ -72,16 +43,6 @@ def plot_temperature_with_spc(
     ax.legend()
     fig.tight_layout()
 
-    summary = {
-        "n_points": int(n_samples),
-        "n_outliers": int(is_outlier.sum()),
-        "outlier_fraction": float(is_outlier.mean()),
-        "satv_center": float(satv_center),
-        "robust_sigma": float(robust_sigma),
-        "satv_lower": float(satv_lower),
-        "satv_upper": float(satv_upper),
-    }
-
     return fig, summary
 
 # Function for plotting precipitation and relevant summaries of outliers
@@ -92,33 +53,17 @@ def plot_precipitation_with_lof(
     outlier_fraction=0.01,  # desired share of outliers (e.g. 0.01 = 1%)
     n_neighbors=20          # neighbors used by LOF
 ):
-    
-    # Ensure chronological order and extract arrays
-    df = df.sort_values(time_col).reset_index(drop=True)
-    time = pd.to_datetime(df[time_col])
-    precip = df[precip_col].to_numpy(dtype=float)
-
-    # Simple NaN handling: interpolate missing values
-    if np.isnan(precip).any():
-        precip = pd.Series(precip).interpolate(limit_direction="both").to_numpy()
-
-    n = len(precip)
-
-    # LOF expects a 2D feature matrix
-    X = precip.reshape(-1, 1)
-
-    # Make sure n_neighbors is valid
-    n_neighbors = max(5, min(n_neighbors, n - 1))
-
-    # Fit Local Outlier Factor model
-    lof = LocalOutlierFactor(
+    # Fit LOF (shared with the data API)
+    points, summary = lof_precipitation(
+        df,
+        time_col=time_col,
+        precip_col=precip_col,
+        outlier_fraction=outlier_fraction,
         n_neighbors=n_neighbors,
-        contamination=outlier_fraction,
-        novelty=False
     )
-    labels = lof.fit_predict(X)  # 1 = inlier, -1 = outlier
-
-    is_outlier = labels == -1
+    time = points[time_col]
+    precip = points[precip_col]
+    is_outlier = points["is_outlier"]
 
     # Plot precipitation with outliers highlighted
     fig, ax = plt.subplots(figsize=(10, 4))
@@ -130,28 +75,9 @@ def plot_precipitation_with_lof(
     ax.legend()
     fig.tight_layout()
 
-    # Simple summary of outliers
-    n_outliers = int(is_outlier.sum())
-    summary = {
-        "n_points": int(n),
-        "n_outliers": n_outliers,
-        "outlier_fraction_estimated": float(n_outliers / n),
-        "precip_min_outlier": float(precip[is_outlier].min()) if n_outliers > 0 else None,
-        "precip_max_outlier": float(precip[is_outlier].max()) if n_outliers > 0 else None,
-    }
-
     return fig, summary
 
 
-# Load Open-Meteo data based on price area
-AREA_COORDS = {
-    "NO1": (59.91390, 10.75220),  # Oslo
-    "NO2": (58.14670, 7.99560),   # Kristiansand
-    "NO3": (63.43050, 10.39510),  # Trondheim
-    "NO4": (69.64920, 18.95600),  # Tromsø
-    "NO5": (60.39299, 5.32415),   # Bergen
-}
-
 # Use shared selection from Production explorer
 pricearea = st.session_state.get("pricearea", "NO1")
 if pricearea not in AREA_COORDS:
@@ -224,12 +150,24 @@ with tab_lof:
         step=1,
     )
 
-    fig_lof, summary_lof = plot_precipitation_with_lof(
-        df_plot,
-        time_col="date",
-        precip_col="precipitation",
-        outlier_fraction=outlier_fraction,
-        n_neighbors=int(n_neighbors),
+    # LOF is the expensive step: share it across sessions with identical settings
+    def render_lof():
+        fig_lof, summary_lof = plot_precipitation_with_lof(
+            df_plot,
+            time_col="date",
+            precip_col="precipitation",
+            outlier_fraction=outlier_fraction,
+            n_neighbors=int(n_neighbors),
+        )
+        return figure_to_png(fig_lof), summary_lof
+
+    png_lof, summary_lof = shared.call(
+        ("lof", pricearea, outlier_fraction, int(n_neighbors), data_fingerprint(df_plot)),
+        render_lof,
     )
-    st.pyplot(fig_lof)
-    st.json(summary_lof)
\ No newline at end of file
+    st.image(png_lof, width="stretch")
+    st.json(summary_lof)
+
+# ---- Shared computation cache (all sessions on this server) ----
+with st.expander("Shared computation cache"):
+    st.json(shared.stats())
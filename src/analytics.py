@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+from scipy.fft import dct, idct
+from sklearn.neighbors import LocalOutlierFactor
+
+# ---- Outlier detection shared by the pages and the data API ----
+
+
+# DCT trend removal + robust SPC limits on temperature (from assignment3.ipynb)
+def spc_temperature(
+    df: pd.DataFrame,
+    time_col="date",
+    temp_col="temperature_2m",
+    trend_keep_fraction=0.02,  # how much of the lowest DCT frequencies to keep for trend
+    sigma_threshold=3.0        # sigma threshold for SPC limits
+):
+    # Ensure chronological order and extract arrays
+    df = df.sort_values(time_col).reset_index(drop=True)
+    timestamps = pd.to_datetime(df[time_col])
+    temp = df[temp_col].to_numpy(dtype=float)
+
+    # Simple NaN handling: interpolate missing values
+    if np.isnan(temp).any():
+        temp = pd.Series(temp).interpolate(limit_direction="both").to_numpy()
+
+    n_samples = len(temp)
+
+    # --------- DCT: separate low-frequency (trend) and high-frequency (variations) ----------
+    coeffs = dct(temp, type=2, norm="ortho")
+
+    # Number of lowest frequencies to keep for the smooth seasonal trend
+    keep = max(1, int(trend_keep_fraction * n_samples))
+
+    trend_coeffs = np.zeros_like(coeffs)
+    trend_coeffs[:keep] = coeffs[:keep]
+    seasonal_trend = idct(trend_coeffs, type=2, norm="ortho")
+
+    # Seasonally Adjusted Temperature Variations (SATV)
+    satv = temp - seasonal_trend
+
+    # --------- Robust SPC statistics on SATV ----------
+    satv_center = np.median(satv)
+    satv_mad = np.median(np.abs(satv - satv_center))
+    # Convert MAD to a normal-consistent sigma; fall back to std if MAD==0
+    robust_sigma = 1.4826 * satv_mad if satv_mad > 0 else np.std(satv)
+
+    satv_lower = satv_center - sigma_threshold * robust_sigma
+    satv_upper = satv_center + sigma_threshold * robust_sigma
+
+    # Outliers are points where SATV is outside limits
+    is_outlier = (satv < satv_lower) | (satv > satv_upper)
+
+    # Per-point result; SPC limits mapped back to temperature scale by adding the trend
+    points = pd.DataFrame({
+        time_col: timestamps,
+        temp_col: temp,
+        "spc_lower": seasonal_trend + satv_lower,
+        "spc_upper": seasonal_trend + satv_upper,
+        "is_outlier": is_outlier,
+    })
+
+    summary = {
+        "n_points": int(n_samples),
+        "n_outliers": int(is_outlier.sum()),
+        "outlier_fraction": float(is_outlier.mean()),
+        "satv_center": float(satv_center),
+        "robust_sigma": float(robust_sigma),
+        "satv_lower": float(satv_lower),
+        "satv_upper": float(satv_upper),
+    }
+
+    return points, summary
+
+
+# Local Outlier Factor on precipitation (from assignment3.ipynb)
+def lof_precipitation(
+    df: pd.DataFrame,
+    time_col="date",
+    precip_col="precipitation",
+    outlier_fraction=0.01,  # desired share of outliers (e.g. 0.01 = 1%)
+    n_neighbors=20          # neighbors used by LOF
+):
+    # Ensure chronological order and extract arrays
+    df = df.sort_values(time_col).reset_index(drop=True)
+    time = pd.to_datetime(df[time_col])
+    precip = df[precip_col].to_numpy(dtype=float)
+
+    # Simple NaN handling: interpolate missing values
+    if np.isnan(precip).any():
+        precip = pd.Series(precip).interpolate(limit_direction="both").to_numpy()
+
+    n = len(precip)
+
+    # LOF expects a 2D feature matrix
+    X = precip.reshape(-1, 1)
+
+    # Make sure n_neighbors is valid
+    n_neighbors = max(5, min(n_neighbors, n - 1))
+
+    # Fit Local Outlier Factor model
+    lof = LocalOutlierFactor(
+        n_neighbors=n_neighbors,
+        contamination=outlier_fraction,
+        novelty=False
+    )
+    labels = lof.fit_predict(X)  # 1 = inlier, -1 = outlier
+
+    is_outlier = labels == -1
+
+    points = pd.DataFrame({
+        time_col: time,
+        precip_col: precip,
+        "is_outlier": is_outlier,
+    })
+
+    # Simple summary of outliers
+    n_outliers = int(is_outlier.sum())
+    summary = {
+        "n_points": int(n),
+        "n_outliers": n_outliers,
+        "outlier_fraction_estimated": float(n_outliers / n),
+        "precip_min_outlier": float(precip[is_outlier].min()) if n_outliers > 0 else None,
+        "precip_max_outlier": float(precip[is_outlier].max()) if n_outliers > 0 else None,
+    }
+
+    return points, summary
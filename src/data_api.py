@@ -0,0 +1,323 @@
+"""Headless HTTP API serving the same aggregates as the Streamlit pages.
+
+Run from the repository root:
+
+    python -m src.data_api --port 8600
+
+Endpoints (all GET, query parameters in brackets are optional):
+
+    /production/areas
+    /production/shares?area=NO1[&year=2021]
+    /production/hourly?area=NO1&month=1[&group=hydro&group=wind][&year=2021]
+    /weather/spc?area=NO1[&trend_keep_fraction=0.02&sigma_threshold=3.0][&year=2021]
+    /weather/lof?area=NO1[&outlier_fraction=0.01&n_neighbors=20][&year=2021]
+
+Responses are JSON ({"meta": ..., "data": [records]}) by default, or an Arrow IPC
+stream with ?format=arrow / Accept: application/vnd.apache.arrow.stream (meta is
+stored in the schema metadata). Every response carries an ETag; If-None-Match
+returns 304, and bodies are gzipped when the client accepts it.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import time
+import traceback
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import requests
+from pymongo.errors import PyMongoError
+
+from src.analytics import lof_precipitation, spc_temperature
+from src.data_loader import (
+    AREA_COORDS,
+    elhub_version,
+    load_elhub_areas,
+    load_elhub_group_totals,
+    load_elhub_hourly,
+    load_open_meteo_api,
+)
+from src.shared_compute import SingleFlight
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+JSON_MIME = "application/json"
+MAX_AGE = 300  # seconds clients may reuse a response without revalidating
+MIN_YEAR = 1940  # first year in the ERA5 archive
+WEATHER_TTL = 3600  # seconds a rendered weather response is reused
+
+# Failures of the data sources behind the API, answered with 502 instead of 500
+UPSTREAM_ERRORS = (requests.RequestException, PyMongoError, duckdb.Error)
+
+# Rendered responses, shared by all request threads. Keys include a data version
+# (see data_version), so entries are never served after the data changes.
+responses = SingleFlight(maxsize=256)
+
+
+def data_version(path: str):
+    """Version of the data behind an endpoint, used in the response cache key."""
+    if path.startswith("/production/"):
+        # Active Parquet copy; this also triggers the ELHUB_MAX_AGE_HOURS refresh
+        return elhub_version()
+    # Open-Meteo data has no version: expire weather responses after WEATHER_TTL
+    return int(time.time() // WEATHER_TTL)
+
+
+# ---- Query parameter helpers ----
+
+def _param(params, name, cast=str, default=None):
+    values = params.get(name)
+    if not values:
+        if default is None:
+            raise ValueError(f"Missing query parameter '{name}'.")
+        return default
+    try:
+        return cast(values[0])
+    except ValueError:
+        raise ValueError(f"Invalid value for '{name}': {values[0]!r}.")
+
+
+def _area(params):
+    area = _param(params, "area")
+    if area not in AREA_COORDS:
+        raise ValueError(f"Unknown price area '{area}'.")
+    return area
+
+
+def _year(params):
+    year = _param(params, "year", int, 2021)
+    if not MIN_YEAR <= year <= date.today().year:
+        raise ValueError(f"'year' must be between {MIN_YEAR} and {date.today().year}.")
+    return year
+
+
+def _weather(params):
+    # Same frame layout as page 6: hourly weather with an explicit date column
+    area = _area(params)
+    year = _year(params)
+    lat, lon = AREA_COORDS[area]
+    df = load_open_meteo_api(latitude=lat, longitude=lon, year=year, area=area)
+    return area, year, df.reset_index().rename(columns={"time": "date"})
+
+
+# ---- Endpoints: each returns (DataFrame, meta dict) ----
+
+def areas_endpoint(params):
+    return pd.DataFrame({"pricearea": load_elhub_areas()}), {}
+
+
+def shares_endpoint(params):
+    area = _area(params)
+    year = _year(params)
+    shares = load_elhub_group_totals(area, year)
+    return shares, {"area": area, "year": year}
+
+
+def hourly_endpoint(params):
+    area = _area(params)
+    year = _year(params)
+    month = _param(params, "month", int)
+    if not 1 <= month <= 12:
+        raise ValueError("'month' must be between 1 and 12.")
+    groups = sorted(params.get("group", []))
+    hourly = load_elhub_hourly(area, year, month, groups)
+    return hourly, {"area": area, "year": year, "month": month, "groups": groups}
+
+
+def spc_endpoint(params):
+    area, year, df = _weather(params)
+    trend_keep_fraction = _param(params, "trend_keep_fraction", float, 0.02)
+    sigma_threshold = _param(params, "sigma_threshold", float, 3.0)
+    points, summary = spc_temperature(
+        df,
+        time_col="date",
+        temp_col="temperature_2m",
+        trend_keep_fraction=trend_keep_fraction,
+        sigma_threshold=sigma_threshold,
+    )
+    outliers = points[points["is_outlier"]].drop(columns="is_outlier")
+    return outliers, {"area": area, "year": year, **summary}
+
+
+def lof_endpoint(params):
+    area, year, df = _weather(params)
+    outlier_fraction = _param(params, "outlier_fraction", float, 0.01)
+    n_neighbors = _param(params, "n_neighbors", int, 20)
+    points, summary = lof_precipitation(
+        df,
+        time_col="date",
+        precip_col="precipitation",
+        outlier_fraction=outlier_fraction,
+        n_neighbors=n_neighbors,
+    )
+    outliers = points[points["is_outlier"]].drop(columns="is_outlier")
+    return outliers, {"area": area, "year": year, **summary}
+
+
+ROUTES = {
+    "/production/areas": areas_endpoint,
+    "/production/shares": shares_endpoint,
+    "/production/hourly": hourly_endpoint,
+    "/weather/spc": spc_endpoint,
+    "/weather/lof": lof_endpoint,
+}
+
+
+# ---- Serialisation ----
+
+def to_json(df: pd.DataFrame, meta: dict) -> bytes:
+    records = json.loads(df.to_json(orient="records", date_format="iso"))
+    return json.dumps({"meta": meta, "data": records}).encode("utf-8")
+
+
+def to_arrow(df: pd.DataFrame, meta: dict) -> bytes:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"meta": json.dumps(meta).encode("utf-8"),
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def render(path: str, params: dict, fmt: str) -> dict:
+    """Run the endpoint and build the full response (plain and gzipped bodies with their ETags)."""
+    df, meta = ROUTES[path](params)
+    if fmt == "arrow":
+        body, mime = to_arrow(df, meta), ARROW_MIME
+    else:
+        body, mime = to_json(df, meta), JSON_MIME
+    # Strong ETags identify exact bytes, so the gzipped body gets its own tag
+    digest = hashlib.sha1(body).hexdigest()
+    return {
+        "body": body,
+        "etag": f'"{digest}"',
+        "gzip": gzip.compress(body, compresslevel=6),
+        "gzip_etag": f'"{digest}-gz"',
+        "mime": mime,
+    }
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """True if the Accept-Encoding header allows gzip (q-values respected)."""
+    qualities = {}
+    for part in accept_encoding.split(","):
+        coding, _, rest = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in rest.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[coding] = q
+    if "gzip" in qualities:
+        return qualities["gzip"] > 0
+    return qualities.get("*", 0) > 0
+
+
+# ---- HTTP handler ----
+
+class DataAPIHandler(BaseHTTPRequestHandler):
+    server_version = "ind320-data-api/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip("/") or "/"
+        if path not in ROUTES:
+            return self._send_error(404, f"Unknown endpoint '{path}'.")
+
+        params = parse_qs(url.query)
+        fmt = self._format(params)
+        params.pop("format", None)
+
+        try:
+            # Cache key: endpoint + normalised parameters + output format + data version
+            query = tuple(sorted((k, tuple(v)) for k, v in params.items()))
+            key = (path, query, fmt, data_version(path))
+            resp = responses.call(key, render, path, params, fmt)
+        except ValueError as e:
+            return self._send_error(400, str(e))
+        except UPSTREAM_ERRORS as e:
+            self.log_error("Upstream failure for %s: %r", self.path, e)
+            return self._send_error(502, f"Upstream data source failed: {e}")
+        except Exception:
+            self.log_error("Error for %s:\n%s", self.path, traceback.format_exc())
+            return self._send_error(500, "Internal server error.")
+
+        # Pick the representation first: the ETag belongs to the exact bytes sent
+        headers = {
+            "Cache-Control": f"public, max-age={MAX_AGE}",
+            "Vary": "Accept, Accept-Encoding",
+        }
+        if accepts_gzip(self.headers.get("Accept-Encoding", "")):
+            body, etag = resp["gzip"], resp["gzip_etag"]
+            headers["Content-Encoding"] = "gzip"
+        else:
+            body, etag = resp["body"], resp["etag"]
+        headers["ETag"] = etag
+
+        # Conditional request: client already has this exact body
+        if_none_match = self.headers.get("If-None-Match", "")
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        if "*" in tags or etag in tags:
+            self.send_response(304)
+            for name, value in headers.items():
+                if name != "Content-Encoding":
+                    self.send_header(name, value)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", resp["mime"])
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _format(self, params):
+        fmt = params.get("format", [None])[0]
+        if fmt in ("arrow", "json"):
+            return fmt
+        if ARROW_MIME in self.headers.get("Accept", ""):
+            return "arrow"
+        return "json"
+
+    def _send_error(self, status, message):
+        body = json.dumps({"error": message}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", JSON_MIME)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve IND320 aggregates over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), DataAPIHandler)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
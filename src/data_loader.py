@@ -1,9 +1,36 @@
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+import duckdb
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as pads
 import streamlit as st
 from pymongo import MongoClient
 import requests
 
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+# Map price areas to city coordinates (used for the Open-Meteo lookups)
+AREA_COORDS = {
+    "NO1": (59.91390, 10.75220),  # Oslo
+    "NO2": (58.14670, 7.99560),   # Kristiansand
+    "NO3": (63.43050, 10.39510),  # Trondheim
+    "NO4": (69.64920, 18.95600),  # Tromsø
+    "NO5": (60.39299, 5.32415),   # Bergen
+}
+
 # Cache function for loading the Open-Meteo subset data
 @st.cache_data(show_spinner=False)
 def load_open_meteo() -> pd.DataFrame:
@@ -12,21 +39,368 @@ def load_open_meteo() -> pd.DataFrame:
     df.set_index("time", inplace=True)
     return df
 
-# Cache function for loading production data from MongoDB (elhub2021 / production_per_group_hour)
-@st.cache_data
-def load_elhub_api_data():
+# ---- Out-of-core Elhub queries: DuckDB over Parquet partitioned by price area and year ----
+#
+# The MongoDB collection is exported to a local Parquet copy and all explorer
+# queries run against it. Layout of ELHUB_PARQUET_DIR:
+#
+#     CURRENT                     name of the active version directory
+#     v<ns>/pricearea=NO1/year=2021/*.parquet
+#     .tmp-*/                     export in progress
+#     .lock                       held while exporting (shared across processes)
+#
+# A new export is written to its own temp directory, renamed to a fresh version
+# directory and then made active by atomically replacing CURRENT, so readers in
+# any process always see a complete dataset. When the copy is older than
+# ELHUB_MAX_AGE_HOURS (0 disables this) it is refreshed in a background thread
+# while the old copy keeps being served; after a failed export no new attempt is
+# made for ELHUB_RETRY_SECONDS. A refresh can also be forced with
+#
+#     python -m src.data_loader --sync
+
+# Local Parquet copy of production_per_group_hour (override with ELHUB_PARQUET_DIR)
+ELHUB_PARQUET_DIR = Path(
+    os.environ.get("ELHUB_PARQUET_DIR", Path(__file__).parent.parent / "data" / "elhub")
+)
+ELHUB_MAX_AGE_HOURS = float(os.environ.get("ELHUB_MAX_AGE_HOURS", 24))
+ELHUB_RETRY_SECONDS = float(os.environ.get("ELHUB_RETRY_SECONDS", 300))
+
+# Columns used by the explorer pages; starttime is stored as naive UTC
+ELHUB_SCHEMA = pa.schema([
+    ("pricearea", pa.string()),
+    ("productiongroup", pa.string()),
+    ("starttime", pa.timestamp("us")),
+    ("quantitykwh", pa.float64()),
+    ("year", pa.int32()),
+])
+
+_elhub_thread_lock = threading.Lock()
+_elhub_state_lock = threading.Lock()  # guards the refresh / failure state below
+_elhub_refresh_thread = None          # background refresh in progress, if any
+_elhub_last_failure = 0.0             # time.time() of the last failed export
+_elhub_last_error = None              # and its exception
+_duckdb_lock = threading.Lock()
+_duckdb_con = None
+
+
+# Exclusive export lock: a thread lock within this process plus a lock file
+# shared with other processes (e.g. the data API running next to Streamlit).
+# Yields True when the lock is held; with blocking=False it yields False instead
+# of waiting when someone else holds it.
+@contextmanager
+def _elhub_export_lock(blocking: bool = True):
+    ELHUB_PARQUET_DIR.mkdir(parents=True, exist_ok=True)
+    if not _elhub_thread_lock.acquire(blocking):
+        yield False
+        return
+    try:
+        with open(ELHUB_PARQUET_DIR / ".lock", "a+b") as f:
+            if not _lock_file(f, blocking):
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                if os.name == "nt":
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+    finally:
+        _elhub_thread_lock.release()
+
+
+def _lock_file(f, blocking: bool) -> bool:
+    if os.name == "nt":
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.1)
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        return True
+    except BlockingIOError:
+        return False
+
+
+def _current_elhub_version() -> str | None:
+    try:
+        version = (ELHUB_PARQUET_DIR / "CURRENT").read_text().strip()
+    except FileNotFoundError:
+        return None
+    return version if (ELHUB_PARQUET_DIR / version).is_dir() else None
+
+
+def _elhub_is_stale() -> bool:
+    if ELHUB_MAX_AGE_HOURS <= 0:
+        return False
+    age = time.time() - (ELHUB_PARQUET_DIR / "CURRENT").stat().st_mtime
+    return age > ELHUB_MAX_AGE_HOURS * 3600
+
+
+# Stream the MongoDB collection into a new Parquet version and make it current.
+# Returns the new version name.
+def sync_elhub_parquet(batch_size: int = 100_000) -> str:
+    with _elhub_export_lock():
+        return _export_elhub_parquet(batch_size)
+
+
+def _export_elhub_parquet(batch_size: int) -> str:
+    # Anything left in a temp directory is from an export that died (we hold the lock)
+    for leftover in ELHUB_PARQUET_DIR.glob(".tmp-*"):
+        shutil.rmtree(leftover, ignore_errors=True)
+
     client = MongoClient(st.secrets["MONGODB_URI"])
-    db = client["elhub2021"]
-    col = db["production_per_group_hour"]
+    col = client["elhub2021"]["production_per_group_hour"]
+    cursor = col.find({}, {"_id": 0, **{c: 1 for c in ELHUB_SCHEMA.names if c != "year"}})
+
+    def batches():
+        chunk = []
+        for doc in cursor:
+            chunk.append(doc)
+            if len(chunk) >= batch_size:
+                yield _elhub_batch(chunk)
+                chunk = []
+        if chunk:
+            yield _elhub_batch(chunk)
+
+    tmp_dir = Path(tempfile.mkdtemp(prefix=".tmp-", dir=ELHUB_PARQUET_DIR))
+    try:
+        pads.write_dataset(
+            batches(),
+            tmp_dir,
+            schema=ELHUB_SCHEMA,
+            format="parquet",
+            partitioning=["pricearea", "year"],
+            partitioning_flavor="hive",
+        )
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    finally:
+        client.close()
+
+    # Fresh version name, then switch the CURRENT pointer in one os.replace
+    previous = _current_elhub_version()
+    version = f"v{time.time_ns()}"
+    tmp_dir.rename(ELHUB_PARQUET_DIR / version)
+    pointer = ELHUB_PARQUET_DIR / f".CURRENT-{version}"
+    pointer.write_text(version)
+    os.replace(pointer, ELHUB_PARQUET_DIR / "CURRENT")
+
+    # Keep the previous version for queries that are still reading it
+    for old in ELHUB_PARQUET_DIR.glob("v*"):
+        if old.name not in (version, previous):
+            shutil.rmtree(old, ignore_errors=True)
+    return version
 
-    # Read all documents, drop the internal MongoDB _id field
-    records = list(col.find({}, {"_id": 0}))
-    client.close()
 
-    # Convert to DataFrame and ensure starttime is a proper datetime column
+def _elhub_batch(records: list[dict]) -> pa.RecordBatch:
     df = pd.DataFrame(records)
-    df["starttime"] = pd.to_datetime(df["starttime"])
-    return df
+    df["starttime"] = pd.to_datetime(df["starttime"], utc=True).dt.tz_localize(None)
+    df["year"] = df["starttime"].dt.year.astype("int32")
+    return pa.RecordBatch.from_pandas(df[ELHUB_SCHEMA.names], schema=ELHUB_SCHEMA, preserve_index=False)
+
+
+# Active Parquet version. A stale copy is returned at once and refreshed in the
+# background; only the very first export (no copy at all) makes callers wait.
+def elhub_version() -> str:
+    current = _current_elhub_version()
+    if current is not None:
+        if _elhub_is_stale():
+            _start_elhub_refresh()
+        return current
+
+    # Sessions waiting for another session's export see the spinner too
+    with st.spinner("Exporting Elhub data from MongoDB to Parquet ..."), _elhub_export_lock():
+        # Another thread or process may have exported while we waited for the lock
+        current = _current_elhub_version()
+        if current is not None:
+            return current
+        # Don't queue up one export attempt per waiting caller while MongoDB is down
+        if _elhub_recently_failed():
+            raise _elhub_last_error
+        try:
+            return _export_elhub_parquet(batch_size=100_000)
+        except Exception as e:
+            _record_elhub_failure(e)
+            raise
+
+
+def _elhub_recently_failed() -> bool:
+    with _elhub_state_lock:
+        return (
+            _elhub_last_error is not None
+            and time.time() - _elhub_last_failure < ELHUB_RETRY_SECONDS
+        )
+
+
+def _record_elhub_failure(error: Exception):
+    global _elhub_last_failure, _elhub_last_error
+    with _elhub_state_lock:
+        _elhub_last_failure = time.time()
+        _elhub_last_error = error
+
+
+# Start at most one background refresh per process, and none during the back-off
+def _start_elhub_refresh():
+    global _elhub_refresh_thread
+    if _elhub_recently_failed():
+        return
+    with _elhub_state_lock:
+        if _elhub_refresh_thread is not None and _elhub_refresh_thread.is_alive():
+            return
+        _elhub_refresh_thread = threading.Thread(
+            target=_refresh_elhub, name="elhub-refresh", daemon=True
+        )
+        _elhub_refresh_thread.start()
+
+
+def _refresh_elhub():
+    # Another process (or a forced sync) holds the lock: leave the refresh to it
+    with _elhub_export_lock(blocking=False) as acquired:
+        if not acquired:
+            return
+        current = _current_elhub_version()
+        if current is not None and not _elhub_is_stale():
+            return
+        try:
+            _export_elhub_parquet(batch_size=100_000)
+        except Exception as e:
+            _record_elhub_failure(e)
+            # Keep serving the previous copy if MongoDB is unavailable
+            logger.warning("Elhub Parquet refresh failed, using %s", current, exc_info=True)
+
+
+# Run SQL against the `elhub` view of one Parquet version
+def _elhub_query(version: str, sql: str, params: list | None = None) -> pd.DataFrame:
+    global _duckdb_con
+
+    with _duckdb_lock:
+        if _duckdb_con is None:
+            _duckdb_con = duckdb.connect()
+
+    # One cursor per call: DuckDB cursors are safe to use from concurrent sessions,
+    # and each query is itself scanned with DuckDB's thread pool. The temp view
+    # is private to the cursor, so concurrent queries can use different versions.
+    glob = (ELHUB_PARQUET_DIR / version / "**" / "*.parquet").as_posix().replace("'", "''")
+    cur = _duckdb_con.cursor()
+    try:
+        cur.execute(
+            "CREATE TEMP VIEW elhub AS SELECT * FROM "
+            f"read_parquet('{glob}', hive_partitioning = true)"
+        )
+        return cur.execute(sql, params or []).df()
+    finally:
+        cur.close()
+
+
+# The public loaders resolve the current version and pass it on, so st.cache_data
+# entries from an older export are never returned after a refresh
+
+def load_elhub_areas() -> list[str]:
+    return _load_elhub_areas(elhub_version())
+
+
+@st.cache_data(show_spinner=False)
+def _load_elhub_areas(version: str) -> list[str]:
+    df = _elhub_query(version, "SELECT DISTINCT pricearea FROM elhub ORDER BY pricearea")
+    return df["pricearea"].tolist()
+
+
+def load_elhub_groups(area: str) -> list[str]:
+    return _load_elhub_groups(elhub_version(), area)
+
+
+@st.cache_data(show_spinner=False)
+def _load_elhub_groups(version: str, area: str) -> list[str]:
+    df = _elhub_query(
+        version,
+        "SELECT DISTINCT productiongroup FROM elhub "
+        "WHERE pricearea = ? AND productiongroup IS NOT NULL ORDER BY productiongroup",
+        [area],
+    )
+    return df["productiongroup"].tolist()
+
+
+# Total kWh and share per production group for one price area and year
+def load_elhub_group_totals(area: str, year: int = 2021) -> pd.DataFrame:
+    return _load_elhub_group_totals(elhub_version(), area, year)
+
+
+@st.cache_data(show_spinner=False)
+def _load_elhub_group_totals(version: str, area: str, year: int) -> pd.DataFrame:
+    return _elhub_query(
+        version,
+        """
+        SELECT productiongroup,
+               SUM(quantitykwh) AS kwh,
+               SUM(quantitykwh) / SUM(SUM(quantitykwh)) OVER () AS share
+        FROM elhub
+        WHERE pricearea = ? AND year = ?
+        GROUP BY productiongroup
+        ORDER BY kwh DESC
+        """,
+        [area, year],
+    )
+
+
+# Hourly kWh per production group for one price area, year and month
+def load_elhub_hourly(
+    area: str,
+    year: int = 2021,
+    month: int = 1,
+    groups: list[str] | None = None,
+) -> pd.DataFrame:
+    return _load_elhub_hourly(elhub_version(), area, year, month, groups)
+
+
+@st.cache_data(show_spinner=False)
+def _load_elhub_hourly(
+    version: str,
+    area: str,
+    year: int,
+    month: int,
+    groups: list[str] | None,
+) -> pd.DataFrame:
+    # Month as a starttime range so Parquet row-group statistics can skip data
+    start = pd.Timestamp(year=year, month=month, day=1)
+    end = start + pd.offsets.MonthBegin(1)
+    sql = """
+        SELECT starttime, productiongroup, SUM(quantitykwh) AS kwh
+        FROM elhub
+        WHERE pricearea = ? AND year = ? AND starttime >= ? AND starttime < ?
+    """
+    params = [area, year, start.to_pydatetime(), end.to_pydatetime()]
+    if groups:
+        sql += " AND list_contains(?, productiongroup)"
+        params.append(list(groups))
+    sql += " GROUP BY starttime, productiongroup ORDER BY starttime, productiongroup"
+    return _elhub_query(version, sql, params)
+
+
+# Raw hourly rows for one price area and production group (input for STL / spectrogram)
+def load_elhub_series(area: str, group: str) -> pd.DataFrame:
+    return _load_elhub_series(elhub_version(), area, group)
+
+
+@st.cache_data(show_spinner=False)
+def _load_elhub_series(version: str, area: str, group: str) -> pd.DataFrame:
+    return _elhub_query(
+        version,
+        """
+        SELECT pricearea, productiongroup, starttime, quantitykwh
+        FROM elhub
+        WHERE pricearea = ? AND productiongroup = ?
+        ORDER BY starttime
+        """,
+        [area, group],
+    )
 
 # Cache function for loading Open-Meteo data from the API
 @st.cache_data(show_spinner=False)
@@ -67,3 +441,14 @@ def load_open_meteo_api(
     df["time"] = pd.to_datetime(df["time"])
     df.set_index("time", inplace=True)
     return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local Parquet copy of the Elhub data.")
+    parser.add_argument("--sync", action="store_true", help="re-export MongoDB to Parquet now")
+    args = parser.parse_args()
+
+    if args.sync:
+        print(f"Exported {ELHUB_PARQUET_DIR / sync_elhub_parquet()}")
+    else:
+        print(f"Current version: {_current_elhub_version()}")
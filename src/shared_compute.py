@@ -0,0 +1,103 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import matplotlib.pyplot as plt
+import pandas as pd
+
+
+# Process-wide single-flight cache for expensive computations.
+# Streamlit runs every browser session as a thread in the same server process,
+# so a module-level instance is shared by all sessions: the first caller for a
+# key computes, concurrent callers with the same key wait on its future, and
+# the finished result lands in a bounded LRU cache.
+class SingleFlight:
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()      # guards the dicts and counters below
+        self._cache = OrderedDict()        # key -> finished result (LRU order)
+        self._inflight = {}                # key -> Future of the running computation
+        self._stats = {
+            "computed": 0,   # calls that actually ran the function
+            "coalesced": 0,  # calls that waited on another caller's computation
+            "hits": 0,       # calls served from the finished-result cache
+            "errors": 0,     # computations that raised
+            "evictions": 0,  # results dropped because the cache was full
+        }
+
+    def call(self, key, fn, *args, **kwargs):
+        """Return fn(*args, **kwargs), sharing the work with every caller using the same key."""
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._cache[key]
+
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._stats["coalesced"] += 1
+
+        # Followers block on the leader's future (errors are re-raised here too)
+        if not leader:
+            return future.result()
+
+        # Leader: compute outside the lock so other keys are not blocked
+        try:
+            value = fn(*args, **kwargs)
+        except BaseException as e:
+            with self._lock:
+                self._stats["errors"] += 1
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._stats["computed"] += 1
+            self._cache[key] = value
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+                self._stats["evictions"] += 1
+            del self._inflight[key]
+        future.set_result(value)
+        return value
+
+    def stats(self) -> dict:
+        """Snapshot of the counters plus current cache / in-flight sizes."""
+        with self._lock:
+            return {
+                **self._stats,
+                "cached": len(self._cache),
+                "inflight": len(self._inflight),
+            }
+
+    def clear(self):
+        """Drop all finished results (running computations are left alone)."""
+        with self._lock:
+            self._cache.clear()
+
+
+# Shared instance used by the pages
+shared = SingleFlight(maxsize=64)
+
+
+# Render a matplotlib figure to PNG bytes and close it.
+# Figures are not thread-safe, so shared results hold the rendered image instead
+# of the live figure; pages display it with st.image.
+def figure_to_png(fig, dpi: int = 200) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+    plt.close(fig)
+    return buf.getvalue()
+
+
+# Content hash of a DataFrame, used in cache keys so shared results are
+# recomputed when the underlying data changes (re-sync, cleared st.cache_data, ...)
+def data_fingerprint(df: pd.DataFrame) -> str:
+    hashes = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
@@ -0,0 +1,74 @@
+# Shared fixtures: a fake MongoDB collection and a temporary Parquet copy
+from datetime import datetime, timedelta
+
+import pytest
+
+from src import data_loader
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, filter=None, projection=None):
+        keep = [k for k, v in (projection or {}).items() if v and k != "_id"]
+        return iter([{k: d[k] for k in keep} for d in self.docs])
+
+
+class FakeMongoClient:
+    docs = []
+
+    @classmethod
+    def set_kwh(cls, kwh):
+        cls.docs = make_docs(kwh)
+
+    def __init__(self, uri=None):
+        pass
+
+    def __getitem__(self, name):
+        return {"production_per_group_hour": FakeCollection(self.docs)}
+
+    def close(self):
+        pass
+
+
+def make_docs(kwh):
+    start = datetime(2021, 1, 31, 22)
+    return [
+        {
+            "pricearea": area,
+            "productiongroup": group,
+            "starttime": start + timedelta(hours=h),
+            "quantitykwh": kwh,
+        }
+        for area in ["NO1", "NO2"]
+        for group in ["hydro", "wind"]
+        for h in range(4)  # two hours in January, two in February
+    ]
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """Fake MongoClient class installed in data_loader (set data with mongo.set_kwh)."""
+    monkeypatch.setattr(data_loader, "MongoClient", FakeMongoClient)
+    monkeypatch.setattr(data_loader.st, "secrets", {"MONGODB_URI": "mongodb://fake"})
+    monkeypatch.setattr(FakeMongoClient, "docs", make_docs(1.0))
+    return FakeMongoClient
+
+
+@pytest.fixture
+def elhub(mongo, tmp_path, monkeypatch):
+    """Empty Parquet directory for data_loader, backed by the fake MongoDB."""
+    monkeypatch.setattr(data_loader, "ELHUB_PARQUET_DIR", tmp_path / "elhub")
+    monkeypatch.setattr(data_loader, "_elhub_refresh_thread", None)
+    monkeypatch.setattr(data_loader, "_elhub_last_failure", 0.0)
+    monkeypatch.setattr(data_loader, "_elhub_last_error", None)
+    yield tmp_path / "elhub"
+    # Background refreshes must finish before the patches above are undone
+    wait_for_refresh()
+
+
+def wait_for_refresh():
+    thread = data_loader._elhub_refresh_thread
+    if thread is not None:
+        thread.join(timeout=30)
@@ -0,0 +1,212 @@
+import gzip
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+import requests
+
+from src import data_api, data_loader
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("gzip", True),
+        ("gzip, deflate, br", True),
+        ("gzip;q=0.5", True),
+        ("gzip;q=0", False),
+        ("deflate", False),
+        ("*", True),
+        ("*;q=0", False),
+        ("gzip;q=0, *", False),
+        ("", False),
+    ],
+)
+def test_accepts_gzip(header, expected):
+    assert data_api.accepts_gzip(header) is expected
+
+
+def serve():
+    srv = data_api.ThreadingHTTPServer(("127.0.0.1", 0), data_api.DataAPIHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_port}"
+
+
+@pytest.fixture
+def server(monkeypatch):
+    def ok(params):
+        return pd.DataFrame({"x": [1, 2]}), {"area": data_api._area(params)}
+
+    def upstream(params):
+        raise requests.HTTPError("400 Client Error")
+
+    def broken(params):
+        raise KeyError("bug")
+
+    monkeypatch.setattr(data_api, "ROUTES", {"/ok": ok, "/upstream": upstream, "/broken": broken})
+    monkeypatch.setattr(data_api, "responses", data_api.SingleFlight())
+    monkeypatch.setattr(data_api, "data_version", lambda path: None)
+
+    srv, url = serve()
+    yield url
+    srv.shutdown()
+    srv.server_close()
+
+
+def fake_weather(latitude, longitude, year=2021, area=None):
+    rng = np.random.default_rng(0)
+    time = pd.date_range(f"{year}-01-01", periods=24 * 60, freq="h", name="time")
+    precipitation = rng.exponential(0.3, len(time))
+    precipitation[::200] = 25.0  # a few obvious outliers
+    return pd.DataFrame({
+        "temperature_2m": rng.normal(0, 3, len(time)),
+        "precipitation": precipitation,
+    }, index=time)
+
+
+@pytest.fixture
+def real_server(elhub, monkeypatch):
+    """The real routes, backed by the fake MongoDB and fake Open-Meteo data."""
+    monkeypatch.setattr(data_api, "responses", data_api.SingleFlight())
+    monkeypatch.setattr(data_api, "load_open_meteo_api", fake_weather)
+
+    srv, url = serve()
+    yield url
+    srv.shutdown()
+    srv.server_close()
+
+
+def get(url, **headers):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as r:
+            return r.status, r.headers, r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_json_response_and_conditional_get(server):
+    status, headers, body = get(f"{server}/ok?area=NO1")
+    assert status == 200
+    assert json.loads(body) == {"meta": {"area": "NO1"}, "data": [{"x": 1}, {"x": 2}]}
+
+    status, _, _ = get(f"{server}/ok?area=NO1", **{"If-None-Match": headers["ETag"]})
+    assert status == 304
+
+
+def test_gzip_variant_has_its_own_etag(server):
+    _, plain, _ = get(f"{server}/ok?area=NO1")
+    status, zipped, body = get(f"{server}/ok?area=NO1", **{"Accept-Encoding": "gzip"})
+    assert status == 200
+    assert zipped["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(body))["meta"] == {"area": "NO1"}
+    assert zipped["ETag"] != plain["ETag"]
+
+    # The plain ETag does not validate the gzipped representation
+    status, _, _ = get(
+        f"{server}/ok?area=NO1",
+        **{"Accept-Encoding": "gzip", "If-None-Match": plain["ETag"]},
+    )
+    assert status == 200
+
+    status, headers, _ = get(f"{server}/ok?area=NO1", **{"Accept-Encoding": "gzip;q=0"})
+    assert headers["Content-Encoding"] is None
+    assert headers["ETag"] == plain["ETag"]
+
+
+@pytest.mark.parametrize(
+    "path, status",
+    [
+        ("/ok?area=XX", 400),
+        ("/upstream", 502),
+        ("/broken", 500),
+        ("/missing", 404),
+    ],
+)
+def test_errors_are_json(server, path, status):
+    got, headers, body = get(f"{server}{path}")
+    assert got == status
+    assert headers["Content-Type"] == data_api.JSON_MIME
+    assert "error" in json.loads(body)
+
+
+@pytest.mark.parametrize("year", ["1800", "3000", "abc"])
+def test_year_is_validated(year):
+    with pytest.raises(ValueError):
+        data_api._year({"year": [year]})
+
+
+def test_arrow_round_trip_keeps_meta():
+    df = pd.DataFrame({
+        "starttime": pd.date_range("2021-01-01", periods=3, freq="h"),
+        "kwh": [1.0, 2.0, 3.0],
+    })
+    meta = {"area": "NO1", "year": 2021, "groups": ["hydro"]}
+
+    table = pa.ipc.open_stream(data_api.to_arrow(df, meta)).read_all()
+
+    assert json.loads(table.schema.metadata[b"meta"]) == meta
+    pd.testing.assert_frame_equal(table.to_pandas(), df, check_dtype=False)
+
+
+def test_shares_endpoint_as_arrow(real_server):
+    status, headers, body = get(f"{real_server}/production/shares?area=NO1&format=arrow")
+    assert status == 200
+    assert headers["Content-Type"] == data_api.ARROW_MIME
+
+    table = pa.ipc.open_stream(body).read_all()
+    assert json.loads(table.schema.metadata[b"meta"]) == {"area": "NO1", "year": 2021}
+    assert table.column("productiongroup").to_pylist() in (["hydro", "wind"], ["wind", "hydro"])
+    assert table.column("kwh").to_pylist() == [4.0, 4.0]
+    assert table.column("share").to_pylist() == [0.5, 0.5]
+
+
+def test_hourly_endpoint_filters_groups(real_server):
+    status, _, body = get(f"{real_server}/production/hourly?area=NO2&month=2&group=wind")
+    assert status == 200
+    payload = json.loads(body)
+    assert payload["meta"] == {"area": "NO2", "year": 2021, "month": 2, "groups": ["wind"]}
+    assert [r["productiongroup"] for r in payload["data"]] == ["wind", "wind"]
+    assert all(r["starttime"].startswith("2021-02-01") for r in payload["data"])
+
+
+def test_resync_changes_production_responses(real_server, mongo):
+    url = f"{real_server}/production/shares?area=NO1"
+    _, before, body = get(url)
+    assert [r["kwh"] for r in json.loads(body)["data"]] == [4.0, 4.0]
+
+    mongo.set_kwh(5.0)
+    data_loader.sync_elhub_parquet()
+
+    status, after, body = get(url, **{"If-None-Match": before["ETag"]})
+    assert status == 200
+    assert after["ETag"] != before["ETag"]
+    assert [r["kwh"] for r in json.loads(body)["data"]] == [20.0, 20.0]
+
+
+@pytest.mark.parametrize("path, value_col", [
+    ("/weather/spc?area=NO3", "temperature_2m"),
+    ("/weather/lof?area=NO3&outlier_fraction=0.01", "precipitation"),
+])
+def test_weather_endpoints_return_outliers(real_server, path, value_col):
+    status, _, body = get(f"{real_server}{path}")
+    assert status == 200
+    payload = json.loads(body)
+    meta = payload["meta"]
+    assert meta["area"] == "NO3"
+    assert meta["n_points"] == 24 * 60
+    assert len(payload["data"]) == meta["n_outliers"] > 0
+    assert set(payload["data"][0]) == {"date", value_col} | (
+        {"spc_lower", "spc_upper"} if value_col == "temperature_2m" else set()
+    )
+
+
+def test_weather_responses_expire_after_ttl(monkeypatch):
+    monkeypatch.setattr(data_api.time, "time", lambda: 10 * data_api.WEATHER_TTL + 1)
+    first = data_api.data_version("/weather/lof")
+    monkeypatch.setattr(data_api.time, "time", lambda: 11 * data_api.WEATHER_TTL + 1)
+    assert data_api.data_version("/weather/lof") != first
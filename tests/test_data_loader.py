@@ -0,0 +1,132 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import data_loader
+
+from conftest import wait_for_refresh
+
+
+def test_first_query_exports_and_aggregates(elhub):
+    assert data_loader.load_elhub_areas() == ["NO1", "NO2"]
+    assert data_loader.load_elhub_groups("NO1") == ["hydro", "wind"]
+
+    totals = data_loader.load_elhub_group_totals("NO1", 2021)
+    assert totals["kwh"].tolist() == [4.0, 4.0]
+    assert totals["share"].tolist() == [0.5, 0.5]
+
+    hourly = data_loader.load_elhub_hourly("NO1", 2021, 2, ["wind"])
+    assert len(hourly) == 2
+    assert set(hourly["productiongroup"]) == {"wind"}
+    assert (hourly["starttime"].dt.month == 2).all()
+
+    series = data_loader.load_elhub_series("NO2", "hydro")
+    assert len(series) == 4
+    assert series["starttime"].is_monotonic_increasing
+
+
+def test_sync_switches_version_and_keeps_one_previous(elhub, mongo):
+    first = data_loader.elhub_version()
+    assert data_loader.load_elhub_group_totals("NO1", 2021)["kwh"].sum() == 8.0
+
+    mongo.set_kwh(2.0)
+    second = data_loader.sync_elhub_parquet()
+    third = data_loader.sync_elhub_parquet()
+
+    assert len({first, second, third}) == 3
+    assert (elhub / "CURRENT").read_text() == third
+    assert sorted(p.name for p in elhub.glob("v*")) == sorted([second, third])
+    assert not list(elhub.glob(".tmp-*"))
+    # Cached results from the old version are not reused
+    assert data_loader.load_elhub_group_totals("NO1", 2021)["kwh"].sum() == 16.0
+
+
+def make_stale(elhub, monkeypatch):
+    old = time.time() - 2 * 3600
+    os.utime(elhub / "CURRENT", (old, old))
+    monkeypatch.setattr(data_loader, "ELHUB_MAX_AGE_HOURS", 1)
+
+
+def call_concurrently(n):
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        return list(pool.map(lambda _: data_loader.elhub_version(), range(n)))
+
+
+def test_stale_copy_is_served_while_refreshing_in_background(elhub, mongo, monkeypatch):
+    first = data_loader.elhub_version()
+    assert data_loader.elhub_version() == first
+    make_stale(elhub, monkeypatch)
+
+    exports = []
+
+    class SlowClient(mongo):
+        def __getitem__(self, name):
+            exports.append(1)
+            time.sleep(1.0)
+            return super().__getitem__(name)
+
+    monkeypatch.setattr(data_loader, "MongoClient", SlowClient)
+
+    # No caller waits for the export, and only one export runs
+    start = time.perf_counter()
+    assert call_concurrently(8) == [first] * 8
+    assert time.perf_counter() - start < 0.5
+
+    wait_for_refresh()
+    assert len(exports) == 1
+    assert data_loader.elhub_version() != first
+
+
+def test_failed_refresh_backs_off_and_keeps_previous_copy(elhub, mongo, monkeypatch):
+    first = data_loader.elhub_version()
+    make_stale(elhub, monkeypatch)
+
+    attempts = []
+
+    class DownClient(mongo):
+        def __getitem__(self, name):
+            attempts.append(1)
+            raise ConnectionError("mongo down")
+
+    monkeypatch.setattr(data_loader, "MongoClient", DownClient)
+    assert data_loader.elhub_version() == first
+    wait_for_refresh()
+    assert len(attempts) == 1
+    assert not list(elhub.glob(".tmp-*"))
+
+    # Repeated and concurrent calls during the back-off do not retry the export
+    for _ in range(3):
+        assert data_loader.elhub_version() == first
+    assert call_concurrently(8) == [first] * 8
+    wait_for_refresh()
+    assert len(attempts) == 1
+
+    # After the back-off one new attempt is made
+    monkeypatch.setattr(data_loader, "ELHUB_RETRY_SECONDS", 0)
+    assert data_loader.elhub_version() == first
+    wait_for_refresh()
+    assert len(attempts) == 2
+
+
+def test_failed_first_export_is_not_retried_by_every_waiter(elhub, mongo, monkeypatch):
+    attempts = []
+
+    class DownClient(mongo):
+        def __getitem__(self, name):
+            attempts.append(1)
+            time.sleep(0.1)
+            raise ConnectionError("mongo down")
+
+    monkeypatch.setattr(data_loader, "MongoClient", DownClient)
+
+    def call(_):
+        try:
+            return data_loader.elhub_version()
+        except ConnectionError as e:
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(call, range(8)))
+
+    assert results == ["mongo down"] * 8
+    assert len(attempts) == 1
@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from src.shared_compute import SingleFlight, data_fingerprint
+
+
+def test_concurrent_callers_are_coalesced():
+    sf = SingleFlight()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return 42
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(sf.call("k", slow)))
+    leader.start()
+    started.wait(timeout=5)
+
+    followers = [
+        threading.Thread(target=lambda: results.append(sf.call("k", slow)))
+        for _ in range(5)
+    ]
+    for t in followers:
+        t.start()
+    # Let the followers reach the in-flight future before the leader finishes
+    while sf.stats()["coalesced"] < 5:
+        time.sleep(0.01)
+    release.set()
+    for t in [leader, *followers]:
+        t.join(timeout=5)
+
+    assert results == [42] * 6
+    assert len(calls) == 1
+    stats = sf.stats()
+    assert stats["computed"] == 1
+    assert stats["coalesced"] == 5
+    assert stats["inflight"] == 0
+
+
+def test_finished_results_are_served_from_cache():
+    sf = SingleFlight()
+    assert sf.call("k", lambda: "a") == "a"
+    assert sf.call("k", lambda: "b") == "a"
+    assert sf.stats()["hits"] == 1
+
+
+def test_errors_reach_all_waiters_and_are_not_cached():
+    sf = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(timeout=5)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            sf.call("k", failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(timeout=5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while sf.stats()["coalesced"] < 1:
+        time.sleep(0.01)
+    release.set()
+    leader.join(timeout=5)
+    follower.join(timeout=5)
+
+    assert errors == ["boom", "boom"]
+    assert sf.stats()["errors"] == 1
+    assert sf.stats()["cached"] == 0
+
+    # The next call computes again instead of replaying the error
+    assert sf.call("k", lambda: "ok") == "ok"
+
+
+def test_least_recently_used_entries_are_evicted():
+    sf = SingleFlight(maxsize=2)
+    sf.call("a", lambda: 1)
+    sf.call("b", lambda: 2)
+    sf.call("a", lambda: 1)  # touch "a" so "b" is the oldest
+    sf.call("c", lambda: 3)
+
+    assert sf.stats()["evictions"] == 1
+    assert sf.stats()["cached"] == 2
+    assert sf.call("b", lambda: "recomputed") == "recomputed"
+    assert sf.call("c", lambda: "stale") == 3
+
+
+def test_clear_drops_cached_results():
+    sf = SingleFlight()
+    sf.call("k", lambda: 1)
+    sf.clear()
+    assert sf.call("k", lambda: 2) == 2
+
+
+def test_data_fingerprint_changes_with_data():
+    df = pd.DataFrame({"x": [1.0, 2.0, 3.0]})
+    assert data_fingerprint(df) == data_fingerprint(df.copy())
+    changed = df.copy()
+    changed.loc[1, "x"] = 2.5
+    assert data_fingerprint(df) != data_fingerprint(changed)
+
+
+@pytest.mark.parametrize("maxsize", [1, 3])
+def test_cache_never_exceeds_maxsize(maxsize):
+    sf = SingleFlight(maxsize=maxsize)
+    for i in range(10):
+        sf.call(i, lambda i=i: i)
+    assert sf.stats()["cached"] == maxsize
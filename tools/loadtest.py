@@ -0,0 +1,365 @@
+"""Concurrent-session load test for the Streamlit pages.
+
+Drives the page scripts headlessly with Streamlit's AppTest from many simulated
+sessions at once. MongoDB and the Open-Meteo archive API are replaced by local
+stubs with synthetic 2021 data, so no secrets or network are needed. The Elhub
+Parquet copy is written to a temporary directory that is removed afterwards.
+
+Run from the repository root:
+
+    python -m tools.loadtest --users 20 --iterations 10
+    python -m tools.loadtest --users 50 --pages 3 6 --json results.json
+
+Each session opens the page, then repeatedly changes a random widget and reruns.
+Sessions are threads in one process, like browser sessions on a Streamlit server,
+so st.cache_data and the shared computation cache are shared between them. Each
+page is tested in its own fresh process.
+Per page the report shows rerun latency p50/p95/p99 (timed-out and crashed reruns
+included), reruns per second, page errors, failed reruns and the growth in
+process memory (RSS, measured after garbage collection).
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGES_DIR = ROOT / "pages"
+
+AREAS = ["NO1", "NO2", "NO3", "NO4", "NO5"]
+GROUPS = ["hydro", "other", "solar", "thermal", "wind"]
+
+
+# ---- Local stubs for MongoDB and Open-Meteo ----
+
+# Synthetic hourly production for every area and group in 2021
+def fake_elhub_records(year: int = 2021) -> list[dict]:
+    rng = np.random.default_rng(0)
+    times = pd.date_range(f"{year}-01-01", f"{year}-12-31 23:00", freq="h")
+    hours = np.arange(len(times))
+    frames = []
+    for area in AREAS:
+        for group in GROUPS:
+            base = rng.uniform(1e4, 1e6)
+            daily = 1 + 0.3 * np.sin(2 * np.pi * hours / 24)
+            yearly = 1 + 0.5 * np.cos(2 * np.pi * hours / len(times))
+            noise = rng.normal(1, 0.05, len(times))
+            frames.append(pd.DataFrame({
+                "pricearea": area,
+                "productiongroup": group,
+                "starttime": times,
+                "quantitykwh": base * daily * yearly * noise,
+            }))
+    return pd.concat(frames, ignore_index=True).to_dict("records")
+
+
+class FakeCollection:
+    def __init__(self, records):
+        self.records = records
+
+    def find(self, filter=None, projection=None):
+        # Only simple inclusion projections are needed by data_loader
+        keep = [k for k, v in (projection or {}).items() if v and k != "_id"]
+        for doc in self.records:
+            yield {k: doc[k] for k in keep} if keep else dict(doc)
+
+
+class FakeMongoClient:
+    records = None
+    _lock = threading.Lock()
+
+    def __init__(self, uri=None, **kwargs):
+        with FakeMongoClient._lock:
+            if FakeMongoClient.records is None:
+                FakeMongoClient.records = fake_elhub_records()
+
+    def __getitem__(self, db_name):
+        return {"production_per_group_hour": FakeCollection(self.records)}
+
+    def close(self):
+        pass
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+# Synthetic hourly weather in the Open-Meteo archive response format
+def fake_open_meteo_get(url, params=None, timeout=None):
+    seed = int(abs(params["latitude"] * 1000 + params["longitude"]))
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(params["start_date"], f"{params['end_date']} 23:00", freq="h")
+    n = len(times)
+    hours = np.arange(n)
+    temp = 5 - 10 * np.cos(2 * np.pi * hours / n) + 4 * np.sin(2 * np.pi * hours / 24)
+    hourly = {
+        "time": times.strftime("%Y-%m-%dT%H:%M").tolist(),
+        "temperature_2m": (temp + rng.normal(0, 1.5, n)).round(1).tolist(),
+        "precipitation": rng.exponential(0.3, n).round(1).tolist(),
+        "wind_speed_10m": rng.gamma(2, 2, n).round(1).tolist(),
+        "wind_direction_10m": rng.uniform(0, 360, n).round().tolist(),
+        "wind_gusts_10m": rng.gamma(3, 3, n).round(1).tolist(),
+    }
+    return FakeResponse({"hourly": hourly})
+
+
+# ---- Randomised widget interactions ----
+
+def _near(value, step, low, high, rng):
+    # One to three steps away from the current value, like a user nudging an input.
+    # If the bound is hit in the chosen direction, step the other way instead.
+    step = step or (1 if isinstance(value, int) else 0.01)
+    delta = step * rng.choice([-3, -2, -1, 1, 2, 3])
+    for new in (value + delta, value - delta):
+        if low is not None:
+            new = max(low, new)
+        if high is not None:
+            new = min(high, new)
+        if new != value:
+            return type(value)(new)
+    return value
+
+
+def _other(options, current, rng):
+    # A random option different from the current one
+    choices = [o for o in options if o != current]
+    return rng.choice(choices) if choices else current
+
+
+def random_interaction(at, rng) -> bool:
+    """Change one random widget on the page; returns False if the page has no widgets."""
+    actions = []
+    for w in at.radio:
+        actions.append(lambda w=w: w.set_value(_other(w.options, w.value, rng)))
+    for w in at.selectbox:
+        if w.options:
+            actions.append(
+                lambda w=w: w.select_index(_other(range(len(w.options)), w.index, rng))
+            )
+    for w in at.number_input:
+        if w.value is not None:
+            actions.append(
+                lambda w=w: w.set_value(_near(w.value, w.step, w.min, w.max, rng))
+            )
+    for w in at.slider:
+        if not isinstance(w.value, tuple):
+            actions.append(lambda w=w: w.set_value(_near(w.value, w.step, w.min, w.max, rng)))
+    for w in at.select_slider:
+        if len(w.options) < 2:
+            continue
+        if isinstance(w.value, tuple):
+            def pick_range(w=w):
+                i, j = sorted(rng.sample(range(len(w.options)), 2))
+                w.set_range(w.options[i], w.options[j])
+            actions.append(pick_range)
+        else:
+            actions.append(lambda w=w: w.set_value(_other(w.options, w.value, rng)))
+    for w in at.pills:
+        if isinstance(w.value, list):
+            # Multi-select: a random non-empty subset different from the current one
+            if len(w.options) < 2 and w.value:
+                continue
+            def pick_subset(w=w):
+                while True:
+                    subset = [o for o in w.options if rng.random() < 0.5]
+                    if subset and set(subset) != set(w.value):
+                        w.set_value(subset)
+                        return
+            actions.append(pick_subset)
+        elif w.options:
+            actions.append(lambda w=w: w.set_value(_other(w.options, w.value, rng)))
+    for w in at.checkbox:
+        actions.append(lambda w=w: w.set_value(not w.value))
+
+    if not actions:
+        return False
+    rng.choice(actions)()
+    return True
+
+
+# ---- Sessions and metrics ----
+
+def rss_bytes() -> int:
+    # Current resident set size (Linux); falls back to peak RSS elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def run_session(page: Path, iterations: int, timeout: float, seed: int) -> dict:
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    at = AppTest.from_file(str(page), default_timeout=timeout)
+    at.secrets["MONGODB_URI"] = "mongodb://loadtest-stub"
+    at.session_state["pricearea"] = rng.choice(AREAS)
+
+    first, reruns, errors, failed = None, [], 0, 0
+    for i in range(iterations + 1):
+        # Pages without widgets (page 4) are simply rerun as they are
+        if i > 0:
+            random_interaction(at, rng)
+        start = time.perf_counter()
+        try:
+            at.run()
+        except Exception:
+            # Timeouts and crashed reruns: their latency still belongs in the tail
+            failed += 1
+        else:
+            if len(at.exception):
+                errors += 1
+        elapsed = time.perf_counter() - start
+        if i == 0:
+            first = elapsed
+        else:
+            reruns.append(elapsed)
+
+    return {"first": first, "reruns": reruns, "errors": errors, "failed": failed}
+
+
+def run_page(page: Path, users: int, iterations: int, timeout: float, seed: int) -> dict:
+    from src.shared_compute import shared
+
+    coalesced_before = shared.stats()["coalesced"]
+    # Collect garbage left by the previous page so it is not counted against this one
+    gc.collect()
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        futures = [
+            pool.submit(run_session, page, iterations, timeout, seed + u)
+            for u in range(users)
+        ]
+        sessions = [f.result() for f in futures]
+
+    wall = time.perf_counter() - start
+    gc.collect()
+    rss_after = rss_bytes()
+    reruns = np.array([t for s in sessions for t in s["reruns"]])
+    firsts = np.array([s["first"] for s in sessions if s["first"] is not None])
+
+    def pct(values, q):
+        return float(np.percentile(values, q) * 1000) if len(values) else None
+
+    return {
+        "page": page.name,
+        "users": users,
+        "reruns": int(len(reruns)),
+        "first_run_p50_ms": pct(firsts, 50),
+        "p50_ms": pct(reruns, 50),
+        "p95_ms": pct(reruns, 95),
+        "p99_ms": pct(reruns, 99),
+        "reruns_per_s": float((len(reruns) + len(firsts)) / wall) if wall else None,
+        "errors": sum(s["errors"] for s in sessions),
+        "failed": sum(s["failed"] for s in sessions),
+        "rss_growth_mb": (rss_after - rss_before) / 2**20,
+        "coalesced": shared.stats()["coalesced"] - coalesced_before,
+    }
+
+
+def page_worker(page: Path, users: int, iterations: int, timeout: float, seed: int) -> dict:
+    """Run one page's load test in a child process with the stubs installed."""
+    # Import the app's dependencies before the RSS baseline is taken
+    import streamlit.testing.v1  # noqa: F401
+    import src.data_loader
+
+    with mock.patch.object(src.data_loader, "MongoClient", FakeMongoClient), \
+         mock.patch.object(src.data_loader.requests, "get", fake_open_meteo_get):
+        return run_page(page, users, iterations, timeout, seed)
+
+
+def print_report(results: list[dict]):
+    columns = [
+        ("page", "Page", "{}"),
+        ("reruns", "Reruns", "{}"),
+        ("first_run_p50_ms", "First p50 ms", "{:.0f}"),
+        ("p50_ms", "p50 ms", "{:.0f}"),
+        ("p95_ms", "p95 ms", "{:.0f}"),
+        ("p99_ms", "p99 ms", "{:.0f}"),
+        ("reruns_per_s", "Reruns/s", "{:.2f}"),
+        ("errors", "Errors", "{}"),
+        ("failed", "Failed", "{}"),
+        ("rss_growth_mb", "RSS +MB", "{:.1f}"),
+        ("coalesced", "Coalesced", "{}"),
+    ]
+    rows = [[title for _, title, _ in columns]]
+    for r in results:
+        rows.append([fmt.format(r[key]) if r[key] is not None else "-" for key, _, fmt in columns])
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    for row in rows:
+        print("  ".join(cell.ljust(w) for cell, w in zip(row, widths)))
+
+
+def find_page(number: int) -> Path:
+    matches = sorted(PAGES_DIR.glob(f"{number}_*.py"))
+    if not matches:
+        raise SystemExit(f"No page with number {number} in {PAGES_DIR}.")
+    return matches[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Streamlit pages with concurrent sessions.")
+    parser.add_argument("--users", type=int, default=20, help="concurrent sessions per page")
+    parser.add_argument("--iterations", type=int, default=10, help="widget changes per session")
+    parser.add_argument("--pages", type=int, nargs="+", default=[2, 3, 4, 5, 6])
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per rerun")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    pages = [find_page(n) for n in args.pages]
+
+    # Always use a fresh directory for the synthetic Parquet copy: an inherited
+    # ELHUB_PARQUET_DIR could point at the real copy. The copy is never considered
+    # stale, so no background refresh starts during a run. Figures render off-screen.
+    tmp_dir = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    os.environ["ELHUB_PARQUET_DIR"] = str(tmp_dir / "elhub")
+    os.environ["ELHUB_MAX_AGE_HOURS"] = "0"
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    sys.path.insert(0, str(ROOT))
+
+    # One fresh process per page, so memory growth is not mixed with the
+    # allocations (and later frees) of the pages tested before it
+    results = []
+    try:
+        for page in pages:
+            print(f"{page.name}: {args.users} sessions x {args.iterations} interactions ...", flush=True)
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+                future = pool.submit(page_worker, page, args.users, args.iterations, args.timeout, args.seed)
+                results.append(future.result())
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    print()
+    print_report(results)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()